@@ -1,6 +1,8 @@
 import time
 import json
 import os
+import threading
+import numpy as np
 from sts3215_driver import STSServoDriver
 
 # 默认配置
@@ -8,6 +10,9 @@ DEFAULT_CONFIG_FILE = "leader_config.json"
 STS_RESOLUTION = 4096.0
 STS_DEGREE_RANGE = 360.0
 
+# 每步对应的角度 (4096 step = 360 degree)，提前算好避免热路径上重复除法
+_DEG_PER_STEP = STS_DEGREE_RANGE / STS_RESOLUTION
+
 class LeaderArm:
     # 修改 __init__，增加 config_file 参数
     def __init__(self, port, baudrate=1000000, servo_ids=[1, 2, 3, 4, 5, 6, 7], config_file="leader_config.json"):
@@ -16,7 +21,9 @@ class LeaderArm:
         """
         self.config_file = config_file  # 保存文件名到实例变量
         self.servo_ids = servo_ids
-        self.driver = STSServoDriver(port, baudrate)
+        # 读超时压到 8ms: 1Mbaud 下整帧回复 <1ms，丢包时最多吃掉 8ms
+        # 而不是默认 50ms —— 50Hz 遥操作的 20ms 周期经不起半路挂一个超时
+        self.driver = STSServoDriver(port, baudrate, timeout=0.008)
         
         # 检查串口
         if not self.driver.ser or not self.driver.ser.is_open:
@@ -26,17 +33,45 @@ class LeaderArm:
         self.directions = {id: 1 for id in servo_ids}
         
         self.load_config() # 加载指定的文件
+        self._refresh_calibration_arrays()
+
+        # 后台读取线程状态 (见 start_reader_thread)
+        self._reader_thread = None
+        self._stop_evt = threading.Event()
+        self._latest = None
+        self._seq = 0
 
         print(f"Leader Arm Initialized (Config: {self.config_file})")
 
+    def _refresh_calibration_arrays(self):
+        """
+        把 home_offsets / directions 字典展开成与 servo_ids 对齐的 numpy 数组
+        get_angles 的热路径直接用数组做向量运算，不再逐关节查字典
+        校准数据变化后 (load/calibrate/set_direction) 必须重新调用
+        """
+        self._ids_arr = np.array(self.servo_ids, dtype=np.int32)
+        self._offsets_arr = np.array(
+            [self.home_offsets.get(i, 2048) for i in self.servo_ids], dtype=np.int32)
+        self._dirs_arr = np.array(
+            [self.directions.get(i, 1) for i in self.servo_ids], dtype=np.int8)
+        # 校准变了，上一帧的角度缓存作废
+        self._last_raw_tuple = None
+        self._last_angles = None
+
     # 修改 save_config 使用 self.config_file
     def save_config(self):
         config = {
             "home_offsets": self.home_offsets,
             "directions": self.directions
         }
-        with open(self.config_file, 'w') as f:
+        # 原子写入: 先写临时文件再 os.replace 覆盖
+        # 校准过程中 Ctrl+C 也不会留下半截 JSON 毁掉已有校准
+        tmp_file = self.config_file + '.tmp'
+        with open(tmp_file, 'w') as f:
             json.dump(config, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.config_file)
         print(f"Config saved to {self.config_file}")
 
     # 修改 load_config 使用 self.config_file
@@ -67,55 +102,122 @@ class LeaderArm:
 
     def get_raw_positions(self):
         """读取所有舵机的原始数值 (0-4095)"""
+        # 一次 SYNC_READ 广播读完 7 个舵机，替代逐个 READ 的 7 次串口往返
+        raw = self.driver.sync_read(STSServoDriver.SMS_STS_PRESENT_POSITION, 2, self.servo_ids)
         positions = {}
         for sid in self.servo_ids:
-            pos = self.driver.get_position(sid)
-            # 如果读不到(-1)，这里暂时保留上一帧数据或者返回None，视策略而定
-            # 这里简单处理：如果读不到，就设为 -1
-            positions[sid] = pos
+            data = raw.get(sid)
+            if data and len(data) == 2:
+                # Little Endian 解包
+                positions[sid] = data[0] + (data[1] << 8)
+            else:
+                # 读不到就设为 -1
+                positions[sid] = -1
         return positions
 
+    def get_feedback_all(self):
+        """
+        一次 SYNC_READ 读取所有关节的 位置/速度/负载 (从地址 56 连读 6 字节)
+        和位置同步读同样只有一次总线换向，为速度前馈遥操作准备
+        :return: dict {sid: (pos, spd, load)}，没响应的关节为 None
+        """
+        raw = self.driver.sync_read(STSServoDriver.SMS_STS_PRESENT_POSITION, 6, self.servo_ids)
+        feedback = {}
+        for sid in self.servo_ids:
+            data = raw.get(sid)
+            if data and len(data) == 6:
+                # pos 无符号，spd/load 有符号 int16
+                feedback[sid] = STSServoDriver._FB_ST.unpack(data)
+            else:
+                feedback[sid] = None
+        return feedback
+
     def get_angles(self):
         """
         读取并计算当前角度 (单位：度)
         包含【过零点自动修正】逻辑
         """
         raw_data = self.get_raw_positions()
-        angles = {}
-        
-        for sid, raw_val in raw_data.items():
-            if raw_val == -1:
-                angles[sid] = None
-                continue
-            
-            # 1. 获取零点值
-            offset = self.home_offsets.get(sid, 2048)
-            
-            # 2. 计算原始偏差
-            delta = raw_val - offset
-            
-            # ================= [新增] 过零点处理逻辑 =================
-            # STS3215 总分辨率是 4096
-            # 如果偏差 > 2048，说明它向负方向跨过了0点，变成了巨大的正数 -> 减去4096
-            # 如果偏差 < -2048，说明它向正方向跨过了0点，变成了巨大的负数 -> 加上4096
-            
-            if delta > 2048:
-                delta -= 4096
-            elif delta < -2048:
-                delta += 4096
-            # =======================================================
-            
-            # 3. 转换为角度 (4096 step = 360 degree)
-            deg = delta * (360.0 / 4096.0)
-            
-            # 4. 应用方向修正
-            direction = self.directions.get(sid, 1)
-            final_angle = deg * direction
-            
-            angles[sid] = round(final_angle, 2)
-            
+
+        # 操作者静止时 (摆位/暂停很常见) 原始读数完全不变，直接返回上一帧结果
+        raw_tuple = tuple(raw_data[sid] for sid in self.servo_ids)
+        if raw_tuple == self._last_raw_tuple:
+            return self._last_angles
+
+        # 整组关节一次向量运算，替代逐关节的字典查找 + 分支
+        raw = np.array(raw_tuple, dtype=np.int32)
+
+        # ================= 过零点处理逻辑 (无分支) =================
+        # STS3215 总分辨率是 4096 (2 的幂)，所以过零点修正等价于:
+        #   delta = ((delta + 2048) & 0xFFF) - 2048
+        # 一条按位与把偏差折回 [-2048, 2047]，不需要任何比较分支
+        delta = ((raw - self._offsets_arr + 2048) & 0xFFF) - 2048
+        # ==========================================================
+
+        # 2. 转换为角度并应用方向修正
+        # 注意: 这里不做 round()，原始浮点直接给遥操作用；显示用 get_angles_formatted
+        final = delta * _DEG_PER_STEP * self._dirs_arr
+
+        # 只在 API 边界转回字典；读取失败 (-1) 的关节返回 None
+        angles = {sid: (None if raw_val == -1 else float(ang))
+                  for sid, raw_val, ang in zip(self.servo_ids, raw, final)}
+
+        # 有读取失败时不缓存 (下一帧必须重算)
+        self._last_raw_tuple = None if -1 in raw_tuple else raw_tuple
+        self._last_angles = angles
         return angles
 
+    def get_angles_into(self, out):
+        """
+        读取角度并写入调用方预分配的 7 元素数组 (单位：度)
+        读取失败的关节写 NaN，控制环用 np.isfinite(out).all() 一次判整帧有效，
+        替代构造字典 + 逐关节查 None (省掉每周期 8 次 dict 哈希)
+        """
+        raw_data = self.get_raw_positions()
+        raw = np.array([raw_data[sid] for sid in self.servo_ids], dtype=np.int32)
+
+        # 与 get_angles 相同的无分支过零点修正 + 向量换算
+        delta = ((raw - self._offsets_arr + 2048) & 0xFFF) - 2048
+        out[:] = delta * _DEG_PER_STEP * self._dirs_arr
+        out[raw == -1] = np.nan
+        return out
+
+    def get_angles_formatted(self):
+        """get_angles 的显示用包装: 保留两位小数 (仅供 CLI 监视，不要在控制环里用)"""
+        return {sid: (None if v is None else round(v, 2))
+                for sid, v in self.get_angles().items()}
+
+    # ================= 后台读取线程 =================
+
+    def start_reader_thread(self):
+        """
+        启动后台读取线程: 持续 SYNC_READ 并把最新一帧角度发布到 self._latest
+        主循环用 latest() 非阻塞取数，双臂场景下两条总线真正并行读取
+        (串口 I/O 会释放 GIL)。注意: 启动后不要再从其他线程调用 get_angles。
+        """
+        if self._reader_thread and self._reader_thread.is_alive():
+            return
+        self._stop_evt.clear()
+        self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
+        self._reader_thread.start()
+
+    def _reader_loop(self):
+        while not self._stop_evt.is_set():
+            angles = self.get_angles()
+            # 单写单读: 引用赋值是原子的，读者直接取 self._latest，无需加锁
+            self._latest = angles
+            self._seq += 1
+
+    def latest(self):
+        """非阻塞获取后台线程读到的最新角度 (线程未就绪时返回 None)"""
+        return self._latest
+
+    def stop_reader_thread(self):
+        if self._reader_thread:
+            self._stop_evt.set()
+            self._reader_thread.join(timeout=1.0)
+            self._reader_thread = None
+
     # ================= 校准功能 =================
     
     def calibrate_home(self):
@@ -135,6 +237,7 @@ class LeaderArm:
             return
             
         self.home_offsets = current_pos
+        self._refresh_calibration_arrays()
         self.save_config()
         print("✅ Calibration Saved! This pose is now 0.0 degrees.")
         print(f"Offsets: {self.home_offsets}")
@@ -145,31 +248,9 @@ class LeaderArm:
             print("Direction must be 1 or -1")
             return
         self.directions[servo_id] = direction
+        self._refresh_calibration_arrays()
         self.save_config()
 
-    def save_config(self):
-        config = {
-            "home_offsets": self.home_offsets,
-            "directions": self.directions
-        }
-        with open(DEFAULT_CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=4)
-        print(f"Config saved to {DEFAULT_CONFIG_FILE}")
-
-    def load_config(self):
-        if os.path.exists(DEFAULT_CONFIG_FILE):
-            try:
-                with open(DEFAULT_CONFIG_FILE, 'r') as f:
-                    config = json.load(f)
-                    # 转换 key 从 str 回 int (json key 只能是 str)
-                    self.home_offsets = {int(k): v for k, v in config.get("home_offsets", {}).items()}
-                    self.directions = {int(k): v for k, v in config.get("directions", {}).items()}
-                print("Configuration loaded.")
-            except Exception as e:
-                print(f"Failed to load config: {e}")
-        else:
-            print("No config file found. Using defaults.")
-
 # ================= 调试与校准入口 =================
 if __name__ == "__main__":
     # 配置你的端口
@@ -184,6 +265,7 @@ if __name__ == "__main__":
     print("2. Set Torque ON  (Hold mode)")
     print("3. Calibrate HOME (Set current pose as 0)")
     print("4. Monitor Angles (Real-time)")
+    print("5. Change Servo Baud Rate (writes EEPROM, use with care)")
     print("q. Quit")
     
     try:
@@ -206,15 +288,57 @@ if __name__ == "__main__":
             elif cmd == '4':
                 print("Monitoring... Press Ctrl+C to stop.")
                 try:
+                    # 固定节拍调度: 按单调时钟的绝对截止时间睡眠，
+                    # I/O 抖动不会累积成频率漂移
+                    period = 0.05
+                    next_t = time.monotonic() + period
                     while True:
-                        angles = leader.get_angles()
+                        angles = leader.get_angles_formatted()
                         # 格式化输出
                         out = " | ".join([f"J{k}:{v:>6.1f}°" for k, v in angles.items()])
                         print(f"\r{out}", end="", flush=True)
-                        time.sleep(0.05)
+
+                        now = time.monotonic()
+                        if next_t > now:
+                            time.sleep(next_t - now)
+                        else:
+                            # 本帧超时 (读取太慢)，提示用户调周期或波特率
+                            print(f"\n[WARN] Frame overrun: {(now - next_t)*1000:.1f} ms")
+                        next_t += period
                 except KeyboardInterrupt:
                     print("\nStopped monitoring.")
                     
+            elif cmd == '5':
+                codes = leader.driver.BAUD_CODES
+                print(f"Supported bauds: {sorted(codes, reverse=True)}")
+                try:
+                    new_baud = int(input("Enter new baud rate: "))
+                except ValueError:
+                    print("Invalid input.")
+                    continue
+                if new_baud not in codes:
+                    print("Unsupported baud rate.")
+                    continue
+                confirm = input(f"Write baud {new_baud} to ALL servos {leader.servo_ids}? (y/n): ")
+                if confirm.lower() != 'y':
+                    continue
+                # 先在旧速率下把所有舵机都写完，再以新速率重开串口
+                for sid in leader.servo_ids:
+                    leader.driver.set_baud(sid, new_baud)
+                    time.sleep(0.02)
+                if leader.driver.reopen(new_baud):
+                    # 重开后补一次 EEPROM 锁定并验证
+                    ok = []
+                    for sid in leader.servo_ids:
+                        # lock_eeprom 会消费掉写 ack，否则后面的 ping 会读到陈旧帧
+                        leader.driver.lock_eeprom(sid)
+                        time.sleep(0.01)
+                        if leader.driver.ping(sid):
+                            ok.append(sid)
+                    print(f"✅ Reopened at {new_baud}. Responding servos: {ok}")
+                else:
+                    print("❌ Reopen failed. Power-cycle and retry at the new baud.")
+
             elif cmd == 'q':
                 break
                 
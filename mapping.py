@@ -0,0 +1,32 @@
+import numpy as np
+
+# 遥操作热循环的映射核: 一次调用把主手角度帧变成下发动作
+#   前 6 轴:  out = ang * scale          (scale 已预融合 deg2rad * 镜像方向)
+#   夹爪轴:   out = clip(ang*a + b) * scale
+# 有 numba 时 JIT 成机器码 —— 7 元素的循环编译后只有十几条指令，
+# 没装 numba 就退回同签名的 numpy 实现 (和 mk_driver 里 DM_CAN 的可选依赖处理一致)
+
+def _teleop_map_py(ang, grip_a, grip_b, scale, out):
+    out[:] = ang
+    g = out[6] * grip_a + grip_b
+    out[6] = 0.0 if g < 0.0 else 1.0 if g > 1.0 else g
+    np.multiply(out, scale, out=out)
+    return out
+
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def teleop_map(ang, grip_a, grip_b, scale, out):
+        for i in range(6):
+            out[i] = ang[i] * scale[i]
+        g = ang[6] * grip_a + grip_b
+        g = 0.0 if g < 0.0 else 1.0 if g > 1.0 else g
+        out[6] = g * scale[6]
+        return out
+
+    # 导入时预热触发编译; cache=True 下之后的进程直接加载磁盘缓存
+    _warm = np.zeros(7, dtype=np.float32)
+    teleop_map(_warm, 0.0, 0.0, np.ones(7, dtype=np.float32), _warm)
+except ImportError:
+    teleop_map = _teleop_map_py
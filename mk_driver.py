@@ -8,6 +8,8 @@ from typing import Dict, Any
 import cv2
 import threading
 
+from sts3215_driver import set_low_latency
+
 try:
     from drivers.DM_Control_Python.DM_CAN import Motor, MotorControl, DM_Motor_Type, Control_Type, DM_variable
     DRIVERS_AVAILABLE = True
@@ -64,6 +66,9 @@ class MKRobotStandalone:
         # ------------------------------------------------------------
         self.HARDWARE_DIR = np.array([-1.0, 1.0, -1.0, -1.0, -1.0, -1.0, 1.0], dtype=np.float32)
 
+        # send_action 的预分配缓冲: 50Hz 指令流下方向修正/限位不再每次 malloc
+        self._action_scratch = np.empty(7, dtype=np.float32)
+
         # 初始化电机
         if DRIVERS_AVAILABLE:
             self.motors = {
@@ -150,6 +155,8 @@ class MKRobotStandalone:
 
         self.serial_device = serial.Serial(
             self.port, 921600, timeout=0.5)
+        # USB 转串口驱动默认 16ms 聚合延迟，置位 low_latency 降到 1ms
+        set_low_latency(self.serial_device)
         time.sleep(0.3)
 
         self.control = MotorControl(self.serial_device)
@@ -260,19 +267,18 @@ class MKRobotStandalone:
         return obs_dict
 
     def check_joints_limit(self, action_array: np.ndarray) -> np.ndarray:
+        """限位截断 (注意: 原地修改传入数组并返回它，调用方传 scratch 缓冲)"""
         if action_array is None:
             return np.zeros(7, dtype=np.float32)
-            
-        safe_action = action_array.copy()
-        
+
         for i in range(6):
             if i in JOINT_LIMITS:
                 min_lim, max_lim = JOINT_LIMITS[i]
-                safe_action[i] = np.clip(safe_action[i], min_lim, max_lim)
-        
+                action_array[i] = np.clip(action_array[i], min_lim, max_lim)
+
         # 夹爪限位
-        safe_action[6] = np.clip(safe_action[6], 0.0, 1.0)
-        return safe_action  
+        action_array[6] = np.clip(action_array[6], 0.0, 1.0)
+        return action_array
 
     def send_action(self, action: np.ndarray):
         """
@@ -291,9 +297,10 @@ class MKRobotStandalone:
         if not isinstance(action, np.ndarray):
             action = np.array(action, dtype=np.float32)
 
-        target_physical = action * self.HARDWARE_DIR
+        # 方向修正写进预分配缓冲 (不修改调用方传入的数组，也不分配新数组)
+        target_physical = np.multiply(action, self.HARDWARE_DIR, out=self._action_scratch)
 
-        # 1. 安全防护：限位检查
+        # 1. 安全防护：限位检查 (原地截断 scratch)
         # 你的 _send_action 里是直接执行，所以在传给它之前必须截断
         safe_action_arr = self.check_joints_limit(target_physical)
 
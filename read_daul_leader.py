@@ -10,15 +10,30 @@ LEADER_CFG = {
 }
 # ======================================================
 
-def find_port(identifier):
+# comports() 每次调用都要扫 /sys/class/tty 并解析属性 (10ms+)，
+# 只枚举一次，建好 serial->device 索引和 location 列表后反复查询
+_PORT_INDEX = None
+
+def _build_port_index():
     ports = list(serial.tools.list_ports.comports())
-    for p in ports:
-        # 匹配 Serial
-        if p.serial_number == identifier:
-            return p.device
-        # 匹配 Location
-        if p.location and identifier in p.location: # 部分匹配
-            return p.device
+    by_serial = {p.serial_number: p.device for p in ports if p.serial_number}
+    by_loc = [(p.location, p.device) for p in ports if p.location]
+    return by_serial, by_loc
+
+def find_port(identifier, refresh=False):
+    global _PORT_INDEX
+    if _PORT_INDEX is None or refresh:
+        _PORT_INDEX = _build_port_index()
+    by_serial, by_loc = _PORT_INDEX
+
+    # 匹配 Serial (精确，O(1))
+    dev = by_serial.get(identifier)
+    if dev:
+        return dev
+    # 匹配 Location (部分匹配)
+    for loc, device in by_loc:
+        if identifier in loc:
+            return device
     return None
 
 def main():
@@ -43,6 +58,9 @@ def main():
     
     print("\nReading data (Ctrl+C to stop)...")
     try:
+        # 固定节拍调度 (单调时钟 + 绝对截止时间)，I/O 抖动不累积漂移
+        period = 0.1
+        next_t = time.monotonic() + period
         while True:
             out_str = ""
             for side in ['left', 'right']:
@@ -53,10 +71,16 @@ def main():
                     out_str += f"[{side.upper()} J1: {val}]  "
                 else:
                     out_str += f"[{side.upper()} --]  "
-            
+
             print(f"\r{out_str}", end="", flush=True)
-            time.sleep(0.1)
-            
+
+            now = time.monotonic()
+            if next_t > now:
+                time.sleep(next_t - now)
+            else:
+                print(f"\n[WARN] Frame overrun: {(now - next_t)*1000:.1f} ms")
+            next_t += period
+
     except KeyboardInterrupt:
         pass
     finally:
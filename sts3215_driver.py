@@ -1,6 +1,29 @@
 import serial
 import time
 import struct
+import selectors
+import os
+
+def set_low_latency(ser):
+    """
+    给已打开的串口置位内核 ASYNC_LOW_LATENCY 标志
+    FTDI/CH34x 驱动默认按 16ms 周期聚合收包 —— 这是 20ms 控制周期里
+    最大的一块隐藏延迟; 置位后降到 1ms
+    仅 Linux 有效; 驱动不支持该 ioctl (如 CDC-ACM) 或无权限时静默跳过
+    """
+    try:
+        import fcntl
+        import array
+        TIOCGSERIAL = 0x541E
+        TIOCSSERIAL = 0x541F
+        ASYNC_LOW_LATENCY = 1 << 13
+        # struct serial_struct: flags 是第 5 个 int 字段
+        buf = array.array('i', [0] * 32)
+        fcntl.ioctl(ser.fileno(), TIOCGSERIAL, buf)
+        buf[4] |= ASYNC_LOW_LATENCY
+        fcntl.ioctl(ser.fileno(), TIOCSSERIAL, buf)
+    except Exception:
+        pass
 
 class STSServoDriver:
     # 内存表地址 (STS3215 Memory Map)
@@ -27,8 +50,31 @@ class STSServoDriver:
     INST_WRITE = 3
     INST_REG_WRITE = 4
     INST_ACTION = 5
+    INST_SYNC_READ = 130  # 0x82
     INST_SYNC_WRITE = 131 # 0x83
 
+    # 广播 ID (所有舵机都会响应)
+    BROADCAST_ID = 0xFE
+
+    # 波特率代码表 (EEPROM Addr 6，见飞特数据手册)
+    # STS3215 寄存器表最高支持 1 Mbps
+    BAUD_CODES = {
+        1000000: 0,
+        500000:  1,
+        250000:  2,
+        128000:  3,
+        115200:  4,
+        76800:   5,
+        57600:   6,
+        38400:   7,
+    }
+
+    # 预编译的解包器 (C 实现，避免每次解析格式字符串)
+    # 位置是无符号 uint16；速度/负载是有符号 int16，'h' 自带符号扩展
+    _POS_ST = struct.Struct('<H')
+    _FB_ST = struct.Struct('<Hhh')
+    _POS_SPD_ST = struct.Struct('<HH')
+
     def __init__(self, port, baudrate=1000000, timeout=0.05):
         """
         初始化串口
@@ -40,15 +86,73 @@ class STSServoDriver:
         self.baudrate = baudrate
         self.timeout = timeout
         self.ser = None
-        
+        self._fd = None
+        self._sel = None
+
+        # 预构建的指令包缓存 (读位置包 / 同步读广播包)
+        # 稳态读取路径里包内容完全不变，没必要每帧重新拼 list 再转 bytes
+        self._read_pos_pkts = {}
+        self._sync_read_pkts = {}
+        self._sync_write_bufs = {}
+
+        # 预分配的接收缓冲区: 读取路径零分配，长时间遥操作不给 GC 制造垃圾
+        self._rx_buf = bytearray(256)
+        self._rx_mv = memoryview(self._rx_buf)
+
         try:
             self.ser = serial.Serial(port, baudrate, timeout=timeout)
-            # 解决Windows下FTDI/CH340延迟过高的问题(可选，视驱动情况而定)
-            self.ser.flushInput()
+            # 开串口时清一次输入缓存即可；之后由各读取路径自己管理
+            # (半双工总线上每写一次就 flush 会把上一条回复的在途字节冲掉)
+            self.ser.reset_input_buffer()
+            set_low_latency(self.ser)
+            # Linux 下读取走 selector + os.read 快速路径 (见 _read_into)
+            self._fd = self.ser.fileno() if os.name == 'posix' else None
+            self._register_selector()
         except Exception as e:
             print(f"[ERROR] Failed to open serial port: {e}")
 
+    def _read_into(self, offset, need):
+        """
+        从串口读取 need 字节写入接收缓冲区 self._rx_buf[offset:]，返回实际读到的字节数
+        Linux: select 在内核里等数据就绪，然后 os.readv 直接读进预分配缓冲区，
+        比 pyserial 的 Python 层逐字节计数少一半系统调用，且读取路径零分配
+        其他平台退回 pyserial 的 readinto
+        """
+        end = offset + need
+        if end > len(self._rx_buf):
+            # 缓冲区不够大就扩一次 (之后保持)
+            grown = bytearray(end)
+            grown[:len(self._rx_buf)] = self._rx_buf
+            self._rx_buf = grown
+            self._rx_mv = memoryview(self._rx_buf)
+
+        if self._fd is None:
+            return self.ser.readinto(self._rx_mv[offset:end]) or 0
+
+        pos = offset
+        deadline = time.monotonic() + self.timeout
+        while pos < end:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self._sel.select(remaining):
+                break  # 超时
+            n = os.readv(self._fd, [self._rx_mv[pos:end]])
+            if n <= 0:
+                break
+            pos += n
+        return pos - offset
+
+    def _register_selector(self):
+        """fd 注册进 selector 只做一次 (Linux 上是 epoll)，每次读不再重建等待集合"""
+        if self._fd is not None:
+            self._sel = selectors.DefaultSelector()
+            self._sel.register(self._fd, selectors.EVENT_READ)
+
     def close(self):
+        if self._sel:
+            self._sel.close()
+            self._sel = None
         if self.ser and self.ser.is_open:
             self.ser.close()
 
@@ -60,90 +164,145 @@ class STSServoDriver:
         return (~total) & 0xFF
 
     def _write_packet(self, servo_id, instruction, params=None):
+        """
+        发送一条指令包
+        注意: 这里不再每次 flushInput (一次 TCFLUSH ioctl，且会冲掉在途回复字节)
+        约定: 调用方发出读指令后必须把自己的回复消费完，再发下一条指令
+        """
         if params is None:
             params = []
-        
-        # 构造包: [FF, FF, ID, Length, Instruction, P1...Pn, Checksum]
-        length = len(params) + 2 # Length = 指令长度(1) + 参数长度 + 校验和(1)
-        
-        # 内部处理数据包 (不含Header和Checksum，用于计算)
-        payload = [servo_id, length, instruction] + params
-        checksum = self._calc_checksum(payload)
-        
-        # 最终发送的字节流
-        full_packet = [0xFF, 0xFF] + payload + [checksum]
-        
+
         if self.ser and self.ser.is_open:
-            # 清空输入缓存，防止读到之前的残留数据
-            self.ser.flushInput()
-            self.ser.write(bytes(full_packet))
+            self.ser.write(self._build_packet(servo_id, instruction, params))
             return True
         return False
 
+    def _build_packet(self, servo_id, instruction, params):
+        """
+        构建完整指令包: [FF, FF, ID, Length, Instruction, P1...Pn, Checksum]
+        直接往 bytearray 里填字节，校验和对缓冲区切片一次 sum，
+        不再拼接多个临时 list
+        """
+        n = len(params)
+        pkt = bytearray(6 + n)
+        pkt[0] = 0xFF
+        pkt[1] = 0xFF
+        pkt[2] = servo_id
+        pkt[3] = n + 2  # Length = 指令(1) + 参数 + 校验和(1)
+        pkt[4] = instruction
+        pkt[5:5 + n] = params  # bytearray 切片赋值接受 int 序列，无需先转 bytes
+        pkt[5 + n] = (~sum(memoryview(pkt)[2:5 + n])) & 0xFF
+        return bytes(pkt)
+
+    def _send_prebuilt(self, pkt):
+        """快速路径: 直接发送已构建好的包，跳过所有 list 拼接"""
+        if self.ser and self.ser.is_open:
+            self.ser.write(pkt)
+            return True
+        return False
+
+    def _drain_status(self):
+        """
+        消费一条在途状态回复帧 (固定 6 字节)
+        舵机默认应答级别 1，每条单播 WRITE 都会回 ack；不读掉的话
+        它会留在输入缓冲里，让下一次 _read_response 读到陈旧帧而错位
+        (发包路径不再 flushInput 之后，这是写指令方必须履行的约定)
+        """
+        self._read_into(0, 6)
+
     def _read_response(self, servo_id, expected_len):
         """
         读取并解析返回包
         STS返回包格式: [FF, FF, ID, Length, Error, Param1...Pn, Checksum]
+        整帧长度固定为 6 + 参数个数，所以一次 read 读满整帧，
+        再在内存里定位包头，避免逐字节 read(1) 的系统调用开销
         """
         if not self.ser or not self.ser.is_open:
             return None
 
-        # 读取 Header (FF FF)
-        # 这里做一个简单的状态机寻找包头，防止错位
-        header_count = 0
-        start_time = time.time()
-        
-        while True:
-            if time.time() - start_time > self.timeout:
-                return None # 超时
-                
-            byte = self.ser.read(1)
-            if not byte:
-                continue
-            
-            b = ord(byte)
-            if b == 0xFF:
-                header_count += 1
-            else:
-                header_count = 0
-            
-            if header_count == 2:
-                break
-        
-        # 读剩余部分：ID(1) + Len(1) + Err(1) + Params(n) + Checksum(1)
-        # Length 字节代表后面所有字节数 (Err + Params + Checksum)
-        # 我们先读 ID 和 Length
-        meta = self.ser.read(2)
-        if len(meta) < 2:
-            return None
-            
-        resp_id, resp_len = meta[0], meta[1]
-        
-        # 剩余字节数 = Length - 2 (因为 Length 包含了它自己没包含的 checksum... 不，STS协议Length包含 Error+Params+Chk)
-        # STS协议手册：Length = 参数个数 + 2 (Error + Checksum)
-        remaining = resp_len - 2 
-        if remaining < 0: return None # 异常
-
-        # 读取 Error, Params, Checksum
-        # Error(1) + Params(...) + Checksum(1)
-        body = self.ser.read(resp_len)
-        if len(body) != resp_len:
+        need = 6 + expected_len
+        n = self._read_into(0, need)  # 阻塞到读满 need 字节或超时
+
+        # 在内存中寻找包头 (FF FF)，防止错位
+        buf = self._rx_buf
+        idx = buf.find(b'\xff\xff', 0, n)
+        if idx < 0:
+            if n:
+                self.ser.reset_input_buffer()  # 全是杂散字节: 清掉重新同步
+            return None  # 超时
+        if idx > 0:
+            # 包头前有杂散字节: 把帧挪到缓冲区头部，再补读缺失的尾部
+            buf[0:n - idx] = buf[idx:n]
+            n -= idx
+            n += self._read_into(n, need - n)
+        if n < need:
+            self.ser.reset_input_buffer()  # 半截帧: 丢弃残余重新同步
             return None
-            
-        error_byte = body[0]
-        params = body[1:-1]
-        recv_checksum = body[-1]
-        
-        # 校验ID
+
+        resp_id = buf[2]
+        error_byte = buf[4]
+
+        # 校验ID: 对不上说明串进了别的帧 (如上一条写指令没消费的 ack)，
+        # 清空输入缓冲重新同步，避免之后每次读取都错位一帧
         if resp_id != servo_id:
-            return None 
-            
+            self.ser.reset_input_buffer()
+            return None
+
         # (可选) 校验Checksum，这里略过以提高速度，如需严谨控制可加上
-        
+
         if error_byte != 0:
             print(f"[WARN] Servo {servo_id} Error Byte: {error_byte}")
-            
-        return params
+
+        # 返回缓冲区上的 memoryview (零拷贝)；下一次读取前必须消费完
+        return self._rx_mv[5:5 + expected_len]
+
+    def sync_read(self, addr, length, ids):
+        """
+        同步读 (SYNC_READ 0x82): 广播一条读指令，所有舵机按 ID 顺序依次返回状态包
+        相比逐个 INST_READ，整帧只有一次主机->舵机的半双工换向，N 个舵机快约 N 倍
+        :param addr: 起始地址
+        :param length: 每个舵机读取的字节数
+        :param ids: 舵机 ID 列表
+        :return: dict {servo_id: params(bytes)}，没响应的舵机不在结果里
+        """
+        results = {}
+        if not self.ser or not self.ser.is_open:
+            return results
+
+        # 包格式: [FF, FF, FE, Len, 0x82, Addr, DataLen, ID1...IDn, Checksum]
+        # 广播包内容完全静态，按 (addr, length, ids) 缓存，之后每帧直接复用
+        key = (addr, length, tuple(ids))
+        packet = self._sync_read_pkts.get(key)
+        if packet is None:
+            packet = self._build_packet(self.BROADCAST_ID, self.INST_SYNC_READ,
+                                        [addr, length] + list(ids))
+            self._sync_read_pkts[key] = packet
+
+        # 只在广播前清一次残留数据，之后收到的全是本次的回复
+        self.ser.reset_input_buffer()
+        self.ser.write(packet)
+
+        # 每个舵机的回复: [FF, FF, ID, Len, Err, Params(length), Chk] = 6 + length 字节
+        # 所有回复是背靠背连续到达的，一次性读进接收缓冲区再在内存里逐帧解析
+        frame_len = 6 + length
+        total = frame_len * len(ids)
+        n = self._read_into(0, total)
+
+        buf = self._rx_buf
+        pos = 0
+        while True:
+            idx = buf.find(b'\xff\xff', pos, n)
+            if idx < 0 or idx + frame_len > n:
+                break
+            resp_id = buf[idx + 2]
+            error_byte = buf[idx + 4]
+            if error_byte != 0:
+                print(f"[WARN] Servo {resp_id} Error Byte: {error_byte}")
+            # 这里必须拷贝: 缓冲区会被下一次读取复用
+            results[resp_id] = bytes(self._rx_mv[idx + 5: idx + 5 + length])
+            pos = idx + frame_len
+
+        return results
 
     # ================= 常用功能封装 =================
 
@@ -153,10 +312,51 @@ class STSServoDriver:
         resp = self._read_response(servo_id, 0)
         return resp is not None
 
+    def ping_batch(self, ids, window=16):
+        """
+        流水线批量 ping: 一个窗口的 ping 帧合成一次 write 发出，再统一排空回包
+        逐 ID 的 发->等->收 扫描在 1Mbaud 下总线 ~80% 时间在空等，
+        收发重叠后扫描吞吐约提升 window 倍; 按窗口分批避免撑爆接收环形缓冲
+        :return: set 在线的舵机 ID
+        """
+        alive = set()
+        if not self.ser or not self.ser.is_open:
+            return alive
+        ids = list(ids)
+        for start in range(0, len(ids), window):
+            chunk = ids[start:start + window]
+            frames = b''.join(self._build_packet(i, self.INST_PING, []) for i in chunk)
+            self.ser.reset_input_buffer()
+            self.ser.write(frames)
+
+            # 回包每帧固定 6 字节 [FF FF ID 02 ERR CHK]，不在线的不回
+            n = self._read_into(0, 6 * len(chunk))
+            buf = self._rx_buf
+            wanted = set(chunk)
+            idx = 0
+            while True:
+                idx = buf.find(b'\xff\xff', idx, n)
+                if idx < 0 or idx + 6 > n:
+                    break
+                chk = (~sum(memoryview(buf)[idx + 2:idx + 5])) & 0xFF
+                if buf[idx + 2] in wanted and chk == buf[idx + 5]:
+                    alive.add(buf[idx + 2])
+                    idx += 6
+                else:
+                    idx += 1  # 杂散字节，逐字节向后找下一个包头
+        return alive
+
     def enable_torque(self, servo_id, enable=True):
         """开启或关闭力矩 (1=吸合, 0=卸力)"""
         val = 1 if enable else 0
         self._write_packet(servo_id, self.INST_WRITE, [self.SMS_STS_TORQUE_ENABLE, val])
+        self._drain_status()
+
+    def lock_eeprom(self, servo_id, lock=True):
+        """锁定/解锁 EEPROM (Addr 55)"""
+        val = 1 if lock else 0
+        self._write_packet(servo_id, self.INST_WRITE, [self.SMS_STS_LOCK, val])
+        self._drain_status()
 
     def set_position(self, servo_id, position, speed=0, acc=0):
         """
@@ -186,6 +386,7 @@ class STSServoDriver:
         # Params: [Addr, P1, P2...]
         params = [self.SMS_STS_GOAL_POSITION, pos_L, pos_H, spd_L, spd_H]
         self._write_packet(servo_id, self.INST_WRITE, params)
+        self._drain_status()
 
     def get_position(self, servo_id):
         """
@@ -194,14 +395,18 @@ class STSServoDriver:
         """
         # 读取指令: [Addr, Length]
         # 读取 Current Position (Addr 56), 长度 2
-        params = [self.SMS_STS_PRESENT_POSITION, 2]
-        self._write_packet(servo_id, self.INST_READ, params)
-        
+        # 该包对每个 ID 都是固定的，首次构建后缓存复用
+        pkt = self._read_pos_pkts.get(servo_id)
+        if pkt is None:
+            pkt = self._build_packet(servo_id, self.INST_READ,
+                                     [self.SMS_STS_PRESENT_POSITION, 2])
+            self._read_pos_pkts[servo_id] = pkt
+        self._send_prebuilt(pkt)
+
         resp = self._read_response(servo_id, 2)
         if resp and len(resp) == 2:
-            # Little Endian 解包
-            position = resp[0] + (resp[1] << 8)
-            # 处理可能的溢出或符号（STS3215通常是无符号0-4095）
+            # Little Endian 解包（STS3215位置是无符号0-4095）
+            position, = self._POS_ST.unpack_from(resp)
             return position
         return -1
 
@@ -216,27 +421,103 @@ class STSServoDriver:
         
         resp = self._read_response(servo_id, 6)
         if resp and len(resp) == 6:
-            pos = resp[0] + (resp[1] << 8)
-            spd = resp[2] + (resp[3] << 8)
-            # 速度和负载通常是有符号整数 (int16)
-            if spd > 32767: spd -= 65536
-            
-            load = resp[4] + (resp[5] << 8)
-            if load > 32767: load -= 65536
-            
+            # 速度和负载是有符号 int16，'<Hhh' 解包时自动做符号扩展
+            pos, spd, load = self._FB_ST.unpack_from(resp)
             return {'pos': pos, 'speed': spd, 'load': load}
         return None
 
+    def sync_write_positions(self, id_to_pos_speed):
+        """
+        同步写 (SYNC_WRITE 0x83): 一条广播指令同时下发所有舵机的目标位置+速度
+        包格式: [FF, FF, FE, Len, 0x83, Addr(42), DataLen(4),
+                 (ID, PosL, PosH, SpdL, SpdH)*N, Checksum]
+        模板按 ID 集合缓存，每次只用 pack_into 改写 pos/speed 字节并重算校验和，
+        高频指令流下发送路径零分配
+        :param id_to_pos_speed: {servo_id: (position, speed)}
+        """
+        if not self.ser or not self.ser.is_open:
+            return False
+
+        key = tuple(id_to_pos_speed)
+        pkt = self._sync_write_bufs.get(key)
+        if pkt is None:
+            n = len(key)
+            pkt = bytearray(8 + 5 * n)
+            pkt[0] = 0xFF
+            pkt[1] = 0xFF
+            pkt[2] = self.BROADCAST_ID
+            pkt[3] = 5 * n + 4  # Length = 参数个数(2 + 5N) + 2
+            pkt[4] = self.INST_SYNC_WRITE
+            pkt[5] = self.SMS_STS_GOAL_POSITION
+            pkt[6] = 4  # 每个舵机的数据长度 (Pos 2 + Speed 2)
+            for i, sid in enumerate(key):
+                pkt[7 + 5 * i] = sid
+            self._sync_write_bufs[key] = pkt
+
+        for i, (pos, speed) in enumerate(id_to_pos_speed.values()):
+            # 限制范围
+            pos = 0 if pos < 0 else (4095 if pos > 4095 else pos)
+            self._POS_SPD_ST.pack_into(pkt, 8 + 5 * i, pos, speed)
+        pkt[-1] = (~sum(memoryview(pkt)[2:-1])) & 0xFF
+
+        self.ser.write(pkt)
+        return True
+
+    def set_baud(self, servo_id, baud):
+        """
+        改写舵机总线波特率 (慎用，写 EEPROM)
+        串口时间是整帧耗时的大头，总线允许时尽量用 1 Mbps
+        注意: 写完后需要调用 reopen(baud) 以新速率重开串口才能继续通信
+        :param baud: 目标波特率，必须在 BAUD_CODES 表里
+        :return: True 写入成功
+        """
+        code = self.BAUD_CODES.get(baud)
+        if code is None:
+            print(f"[ERROR] Unsupported baud {baud}. Valid: {sorted(self.BAUD_CODES)}")
+            return False
+
+        # 1. 解锁 EEPROM (Addr 55 写 0)
+        self._write_packet(servo_id, self.INST_WRITE, [self.SMS_STS_LOCK, 0])
+        self._drain_status()
+        time.sleep(0.01)
+        # 2. 写入波特率代码 (Addr 6)
+        self._write_packet(servo_id, self.INST_WRITE, [self.SMS_STS_BAUD_RATE, code])
+        self._drain_status()  # ack 可能已经是新速率下的乱码，照样清掉
+        time.sleep(0.01)
+        # 3. 锁定 EEPROM (Addr 55 写 1) —— 此时舵机已经切到新速率，这条会收不到，
+        #    重开串口后由调用方再锁一次更稳妥
+        return True
+
+    def reopen(self, baudrate):
+        """以新波特率重开串口 (配合 set_baud 使用)"""
+        self.close()
+        self.baudrate = baudrate
+        try:
+            self.ser = serial.Serial(self.port, baudrate, timeout=self.timeout)
+            self.ser.reset_input_buffer()
+            set_low_latency(self.ser)
+            self._fd = self.ser.fileno() if os.name == 'posix' else None
+            self._register_selector()
+            return True
+        except Exception as e:
+            print(f"[ERROR] Failed to reopen serial port at {baudrate}: {e}")
+            self.ser = None
+            self._fd = None
+            return False
+
     def change_id(self, old_id, new_id):
         """修改舵机ID (慎用)"""
         # 1. 解锁 EEPROM (Addr 55 写 0)
         self._write_packet(old_id, self.INST_WRITE, [self.SMS_STS_LOCK, 0])
+        self._drain_status()
         time.sleep(0.01)
         # 2. 写入新 ID (Addr 5)
         self._write_packet(old_id, self.INST_WRITE, [self.SMS_STS_ID, new_id])
+        self._drain_status()
         time.sleep(0.01)
         # 3. 锁定 EEPROM (Addr 55 写 1)
         self._write_packet(new_id, self.INST_WRITE, [self.SMS_STS_LOCK, 1])
+        self._drain_status()
         print(f"Changed ID {old_id} to {new_id}")
 
 # ================= 测试代码 =================
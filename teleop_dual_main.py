@@ -1,11 +1,17 @@
 import time
+import os
+import json
+import ctypes
+import threading
 import numpy as np
 import sys
 import serial.tools.list_ports
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入驱动
 from leader_arm_st3215 import LeaderArm
 from mk_driver import MKRobotStandalone
+from mapping import teleop_map
 
 # ================= 配置区域 (混合匹配模式) =================
 
@@ -37,51 +43,166 @@ DIR_CFG = {
 
 # ====================================================================
 
+# 角度->弧度常量 (float32，避免热循环里 float64 提升再转回)
+_DEG2RAD = np.float32(np.pi / 180.0)
+
+def _try_realtime_priority(prio=80, core=2):
+    """
+    尽量把控制循环线程提升为 SCHED_FIFO 实时优先级，压制 CFS 调度抖动
+    (普通进程被打断 10ms+ 会直接变成从手的命令速度尖峰)
+    没有 CAP_SYS_NICE 权限时只提示，不影响正常运行
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(prio))
+        print(f">> Realtime priority enabled (SCHED_FIFO, prio {prio})")
+    except (PermissionError, OSError, AttributeError):
+        print(">> No RT permission (run as root or grant CAP_SYS_NICE for lower jitter)")
+        return
+
+    # 绑定到固定核，减少跨核迁移带来的 cache 抖动 (核不够就跳过)
+    try:
+        if os.cpu_count() and os.cpu_count() > core:
+            os.sched_setaffinity(0, {core})
+    except OSError:
+        pass
+
+    # 锁定内存页 (MCL_CURRENT | MCL_FUTURE = 3)，避免缺页中断打断控制周期
+    try:
+        ctypes.CDLL('libc.so.6', use_errno=True).mlockall(3)
+    except Exception:
+        pass
+
+# comports() 快照缓存: 一次枚举要扫 /sys 并逐个读属性，
+# 同一次运行里短时间内反复调用没必要重新扫
+_PORT_SNAPSHOT = None
+_SNAPSHOT_TTL = 5.0  # 秒
+
+# 已知的机械臂串口适配器 VID/PID
+# 主机上插着 SDR/打印机之类的其他串口设备时，优先匹配这些
+KNOWN_VIDPIDS = {
+    (0x0483, 0x5740),  # STMicro CDC (从手控制板)
+    (0x1A86, 0x7523),  # WCH CH340 (常见 USB-TTL)
+    (0x1A86, 0x55D3),  # WCH CH343
+    (0x0403, 0x6001),  # FTDI FT232
+}
+
+# 端口解析结果的持久化缓存: 重启时 USB 拓扑没变就不用重新枚举
+_PORT_CACHE_FILE = os.path.expanduser('~/.cache/leader_arm/ports.json')
+# udev 在 USB 插拔事件时会重写这两个目录，mtime 都没变 = 拓扑没变
+# 注意 by-id 只给报了序列号的适配器建项 —— CH340 主手这类无/重复序列号、
+# 靠 location 区分的设备只出现在 by-path 里，所以必须两个一起看
+_TOPO_DIRS = ('/dev/serial/by-id', '/dev/serial/by-path')
+
+def _usb_topo_stamp():
+    """当前 USB 串口拓扑的指纹 (两个 udev 目录的 mtime，缺失记 None)"""
+    return [os.path.getmtime(d) if os.path.isdir(d) else None
+            for d in _TOPO_DIRS]
+
 class AutoPortFinder:
+    @staticmethod
+    def _snapshot():
+        """枚举一次串口，建好 serial->device 和 location->device 两个索引"""
+        global _PORT_SNAPSHOT
+        now = time.monotonic()
+        if _PORT_SNAPSHOT is None or now - _PORT_SNAPSHOT[0] > _SNAPSHOT_TTL:
+            ports = list(serial.tools.list_ports.comports())
+            # 已知适配器排后面: dict 后写入者覆盖，键冲突时已知设备胜出
+            ports.sort(key=lambda p: (p.vid, p.pid) in KNOWN_VIDPIDS)
+            snap = [(p.device, p.serial_number or "", p.location or "")
+                    for p in ports]
+            by_sn = {sn: dev for dev, sn, _ in snap if sn}
+            by_loc = {loc: dev for dev, _, loc in snap if loc}
+            _PORT_SNAPSHOT = (now, by_sn, by_loc)
+        return _PORT_SNAPSHOT[1], _PORT_SNAPSHOT[2]
+
     @staticmethod
     def find_ports(target_map):
         print("\n>> Scanning hardware ports...")
         found_ports = {}
-        
-        # 获取当前所有串口的完整信息
-        ports = list(serial.tools.list_ports.comports())
-        
-        # 为了调试，先打印一下当前扫描到的信息
-        # print("   [Debug] Current visible devices:")
-        # for p in ports:
-        #     print(f"   - {p.device} | SN: {p.serial_number} | Loc: {p.location}")
-
         all_success = True
-        
+
+        # 配的就是设备路径 (udev 规则别名或 /dev/serial/by-id 软链) 时
+        # 直接采用，完全跳过 USB 枚举
+        pending = {}
         for name, target_id in target_map.items():
-            matched_dev = None
-            
-            # 遍历所有物理端口寻找匹配
-            for p in ports:
-                # 核心逻辑：既比对序列号，也比对物理位置 (Location)
-                # 只要有一个对上了，就认为是它
-                p_sn = p.serial_number if p.serial_number else ""
-                p_loc = p.location if p.location else ""
-                
-                if target_id == p_sn:
-                    matched_dev = p.device
-                    print(f"   ✅ [{name}] Matched Serial: {target_id} -> {matched_dev}")
-                    break
-                
-                if target_id == p_loc:
-                    matched_dev = p.device
+            if target_id.startswith('/dev/') and os.path.exists(target_id):
+                found_ports[name] = target_id
+                print(f"   ✅ [{name}] Using device path: {target_id}")
+            else:
+                pending[name] = target_id
+        if not pending:
+            return found_ports, all_success
+
+        # 核心逻辑：既比对序列号，也比对物理位置 (Location)
+        # 用预建索引做两次 O(1) 查找，替代逐端口遍历
+        by_sn, by_loc = AutoPortFinder._snapshot()
+
+        for name, target_id in pending.items():
+            matched_dev = by_sn.get(target_id)
+            if matched_dev:
+                print(f"   ✅ [{name}] Matched Serial: {target_id} -> {matched_dev}")
+            else:
+                matched_dev = by_loc.get(target_id)
+                if matched_dev:
                     print(f"   ✅ [{name}] Matched Location: {target_id} -> {matched_dev}")
-                    break
-            
+
+            if not matched_dev:
+                # 兜底: pyserial 的 grep 会在设备名/描述/硬件 ID 里做模糊匹配
+                try:
+                    hit = next(serial.tools.list_ports.grep(target_id), None)
+                except Exception:
+                    hit = None
+                if hit:
+                    matched_dev = hit.device
+                    print(f"   ✅ [{name}] Matched via grep: {target_id} -> {matched_dev}")
+
             if matched_dev:
                 found_ports[name] = matched_dev
             else:
                 print(f"   ❌ [{name}] Device '{target_id}' NOT found!")
                 found_ports[name] = None
                 all_success = False
-                
+
         return found_ports, all_success
 
+    @staticmethod
+    def find_ports_cached(target_map, cache_path=_PORT_CACHE_FILE):
+        """
+        带持久化缓存的端口查找: 上次解析结果存 JSON，
+        by-id/by-path 两个 udev 目录的 mtime 都没变且设备节点都还在就直接复用，
+        冷启动从一轮 comports() 枚举缩到几次 stat
+        """
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+            if (cache.get('targets') == target_map
+                    and cache.get('topo_stamp') == _usb_topo_stamp()
+                    and set(cache.get('ports', {})) == set(target_map)
+                    and all(dev and os.path.exists(dev)
+                            for dev in cache['ports'].values())):
+                print(">> Using cached port map (USB topology unchanged)")
+                for name, dev in cache['ports'].items():
+                    print(f"   ✅ [{name}] {target_map[name]} -> {dev} (cached)")
+                return dict(cache['ports']), True
+        except (OSError, ValueError):
+            pass
+
+        found_ports, success = AutoPortFinder.find_ports(target_map)
+
+        # 只缓存全部命中的结果; 写失败不影响正常启动
+        if success:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp = cache_path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump({'targets': target_map,
+                               'topo_stamp': _usb_topo_stamp(),
+                               'ports': found_ports}, f)
+                os.replace(tmp, cache_path)
+            except OSError:
+                pass
+        return found_ports, success
+
 class DualTeleopSystem:
     def __init__(self):
         self.running = True
@@ -90,7 +211,7 @@ class DualTeleopSystem:
         print("\n=== Initializing Dual Arm Teleoperation (Location/Serial) ===")
         
         # 1. 智能查找端口
-        resolved_ports, success = AutoPortFinder.find_ports(DEVICE_ID_CFG)
+        resolved_ports, success = AutoPortFinder.find_ports_cached(DEVICE_ID_CFG)
         
         if not success:
             print("\n⚠️  Some devices missing. Checking what can be started...")
@@ -125,6 +246,36 @@ class DualTeleopSystem:
             print("❌ No active arms. Exiting.")
             sys.exit(1)
 
+        # ===== 热循环预分配 =====
+        # 每臂一个 float32 scratch 缓冲，原地填充/原地乘，50Hz 下不再每帧分配 ndarray
+        self._scratch = {s: np.empty(7, dtype=np.float32) for s in ('left', 'right')}
+        # 缩放向量融合: 前 6 轴 = deg2rad * 镜像方向，夹爪 = 镜像方向
+        # 一次向量乘同时完成单位转换和方向修正
+        self._scale = {}
+        self._grip_a = {}
+        self._grip_b = {}
+        for s in ('left', 'right'):
+            sc = np.empty(7, dtype=np.float32)
+            sc[:6] = _DEG2RAD * DIR_CFG[s][:6]
+            sc[6] = DIR_CFG[s][6]
+            self._scale[s] = sc
+            # 夹爪线性映射改写成 a*x + b 形式 (span 过小则映射恒为 0)
+            cfg = GRIPPER_CFG[s]
+            span = cfg['close'] - cfg['open']
+            a = 1.0 / span if abs(span) >= 0.1 else 0.0
+            self._grip_a[s] = a
+            self._grip_b[s] = -cfg['open'] * a
+
+        # 两臂硬件完全独立，串口 I/O 会释放 GIL，两个 worker 真正并行
+        self._pool = ThreadPoolExecutor(max_workers=2)
+
+        # 主手角度双缓冲 (每臂 2x7): 生产者线程写一个槽，写完原子发布索引，
+        # 控制循环无锁读最新快照，串口往返彻底移出关键路径
+        self._angle_bufs = {s: np.full((2, 7), np.nan, dtype=np.float32)
+                            for s in ('left', 'right')}
+        self._latest_idx = {s: 0 for s in ('left', 'right')}
+        self._producers = {}
+
     def setup_arm_pair(self, side, leader_port, follower_port, config_file):
         pair = {'leader': None, 'follower': None}
         try:
@@ -148,56 +299,84 @@ class DualTeleopSystem:
     def deg_to_rad(self, deg):
         return deg * (np.pi / 180.0)
 
-    def map_gripper(self, raw_deg, side):
-        cfg = GRIPPER_CFG[side]
-        span = cfg['close'] - cfg['open']
-        if abs(span) < 0.1: return 0.0
-        ratio = (raw_deg - cfg['open']) / span
-        return np.clip(ratio, 0.0, 1.0)
+    def _leader_loop(self, side):
+        """主手读取生产者线程: 持续读角度写入双缓冲的空闲槽，写完才发布索引"""
+        leader = self.arms[side]['leader']
+        bufs = self._angle_bufs[side]
+        idx = self._latest_idx[side]
+        while self.running:
+            idx ^= 1
+            # 直接读进空闲槽 (NaN = 读取失败)，不经过字典
+            leader.get_angles_into(bufs[idx])
+            # 单写单读: 填完数据再原子发布索引，读者永远看到完整一帧
+            self._latest_idx[side] = idx
 
     def process_single_arm(self, side):
         pair = self.arms.get(side)
-        if not pair: return
+        if not pair: return None
 
-        leader = pair['leader']
-        follower = pair['follower']
+        # 无锁取双缓冲里的最新快照 (NaN = 该关节读取失败，跳过本帧)
+        ang = self._angle_bufs[side][self._latest_idx[side]]
+        if not np.isfinite(ang).all(): return None
 
-        leader_angles = leader.get_angles()
-        if None in leader_angles.values(): return
+        # 映射核一次调用: 缩放/方向/夹爪截断全在 mapping.teleop_map 里
+        # (装了 numba 就是编译后的机器码，没装走等价的 numpy 路径)
+        buf = self._scratch[side]
+        teleop_map(ang, self._grip_a[side], self._grip_b[side],
+                   self._scale[side], buf)
 
-        target_state = []
-        for i in range(1, 7):
-            target_state.append(self.deg_to_rad(leader_angles[i]))
-        
-        target_state.append(self.map_gripper(leader_angles[7], side))
-        
-        action_array = np.array(target_state, dtype=np.float32)
-        # 你的 MKRobot 已经处理了物理安装方向，这里只处理镜像逻辑
-        follower.send_action(action_array * DIR_CFG[side])
-        
-        return f"{side[0].upper()}:OK"
+        # 不在这里下发: 返回缓冲，由 run() 把两臂的写并发地一起发出去
+        return buf
 
     def run(self):
         print("\n==================================================")
         print("   Dual-Arm Teleop Running")
         print("==================================================")
-        
+
+        _try_realtime_priority()
+
         input(">> Press Enter to Calibrate Home Positions... ")
         for side, pair in self.arms.items():
             if pair:
                 pair['leader'].calibrate_home()
         print("✅ Calibrated. Loop Starting...")
 
+        # 校准完成后再开生产者线程 (校准期间主线程要独占串口)
+        for side, pair in self.arms.items():
+            if pair:
+                t = threading.Thread(target=self._leader_loop, args=(side,), daemon=True)
+                t.start()
+                self._producers[side] = t
+
         try:
+            # 固定节拍调度 (纳秒格点): 超时的帧直接跳到下一个格点，
+            # 不做"追帧"补发 —— 追帧会在从手上造成命令速度尖峰
+            PERIOD_NS = 20_000_000  # 50Hz
+            next_deadline = time.monotonic_ns() + PERIOD_NS
             while self.running:
-                loop_start = time.time()
-                
-                self.process_single_arm('left')
-                self.process_single_arm('right')
-                
-                elapsed = time.time() - loop_start
-                if elapsed < 0.02:
-                    time.sleep(0.02 - elapsed)
+                # 左右臂并发处理: 单周期耗时变 max(left, right) 而不是两者之和
+                fs = [self._pool.submit(self.process_single_arm, s)
+                      for s in ('left', 'right')]
+                bufs = [f.result() for f in fs]
+
+                # 两路 follower 写背靠背提交，USB 写请求几乎同时发出，
+                # 中间不夹任何 Python 计算
+                ws = [self._pool.submit(self.arms[s]['follower'].send_action, b)
+                      for s, b in zip(('left', 'right'), bufs) if b is not None]
+                for w in ws:
+                    w.result()
+
+                now = time.monotonic_ns()
+                slack = next_deadline - now
+                if slack > 0:
+                    time.sleep(slack / 1e9)
+                else:
+                    # 不足一个周期的超时不算丢格: 下一个格点还在前方，照常追上
+                    missed = (-slack) // PERIOD_NS
+                    if missed:
+                        print(f"\n[WARN] Loop overrun: skipping {missed} slot(s)")
+                        next_deadline += missed * PERIOD_NS
+                next_deadline += PERIOD_NS
 
         except KeyboardInterrupt:
             print("\nStopping...")
@@ -205,6 +384,10 @@ class DualTeleopSystem:
             self.cleanup()
 
     def cleanup(self):
+        self.running = False
+        for t in self._producers.values():
+            t.join(timeout=1.0)
+        self._pool.shutdown(wait=False)
         for side, pair in self.arms.items():
             if pair:
                 try:
@@ -213,5 +396,6 @@ class DualTeleopSystem:
                 except: pass
 
 if __name__ == "__main__":
-    sys = DualTeleopSystem()
-    sys.run()
\ No newline at end of file
+    # 别叫 sys: 会遮蔽 sys 模块，之后再调 sys.exit() 就炸了
+    app = DualTeleopSystem()
+    app.run()
\ No newline at end of file
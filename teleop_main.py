@@ -1,4 +1,7 @@
 import time
+import os
+import collections
+import threading
 import numpy as np
 import sys
 import argparse
@@ -31,37 +34,84 @@ ARM_CONFIGS = {
 }
 # ==================================================
 
+# comports() 快照缓存: 一次枚举要扫 /sys 并逐个读属性，
+# 同一次运行里短时间内反复调用没必要重新扫
+_PORT_SNAPSHOT = None
+_SNAPSHOT_TTL = 5.0  # 秒
+
+# 已知的机械臂串口适配器 VID/PID
+# 主机上插着 SDR/打印机之类的其他串口设备时，优先匹配这些
+KNOWN_VIDPIDS = {
+    (0x0483, 0x5740),  # STMicro CDC (从手控制板)
+    (0x1A86, 0x7523),  # WCH CH340 (常见 USB-TTL)
+    (0x1A86, 0x55D3),  # WCH CH343
+    (0x0403, 0x6001),  # FTDI FT232
+}
+
 class AutoPortFinder:
+    @staticmethod
+    def _snapshot():
+        """枚举一次串口，建好 serial->device 和 location->device 两个索引"""
+        global _PORT_SNAPSHOT
+        now = time.monotonic()
+        if _PORT_SNAPSHOT is None or now - _PORT_SNAPSHOT[0] > _SNAPSHOT_TTL:
+            ports = list(serial.tools.list_ports.comports())
+            # 已知适配器排后面: dict 后写入者覆盖，键冲突时已知设备胜出
+            ports.sort(key=lambda p: (p.vid, p.pid) in KNOWN_VIDPIDS)
+            snap = [(p.device, p.serial_number or "", p.location or "")
+                    for p in ports]
+            by_sn = {sn: dev for dev, sn, _ in snap if sn}
+            by_loc = {loc: dev for dev, _, loc in snap if loc}
+            _PORT_SNAPSHOT = (now, by_sn, by_loc)
+        return _PORT_SNAPSHOT[1], _PORT_SNAPSHOT[2]
+
     @staticmethod
     def find_ports(target_map):
         print("\n>> Scanning hardware ports...")
         found_ports = {}
-        ports = list(serial.tools.list_ports.comports())
         all_success = True
-        
+
+        # 配的就是设备路径 (udev 规则别名或 /dev/serial/by-id 软链) 时
+        # 直接采用，完全跳过 USB 枚举
+        pending = {}
         for name, target_id in target_map.items():
-            matched_dev = None
-            for p in ports:
-                p_sn = p.serial_number if p.serial_number else ""
-                p_loc = p.location if p.location else ""
-                
-                if target_id == p_sn:
-                    matched_dev = p.device
-                    print(f"   ✅ [{name}] Matched Serial: {target_id} -> {matched_dev}")
-                    break
-                
-                if target_id == p_loc:
-                    matched_dev = p.device
+            if target_id.startswith('/dev/') and os.path.exists(target_id):
+                found_ports[name] = target_id
+                print(f"   ✅ [{name}] Using device path: {target_id}")
+            else:
+                pending[name] = target_id
+        if not pending:
+            return found_ports, all_success
+
+        # 用预建索引做两次 O(1) 查找，替代逐端口遍历
+        by_sn, by_loc = AutoPortFinder._snapshot()
+
+        for name, target_id in pending.items():
+            matched_dev = by_sn.get(target_id)
+            if matched_dev:
+                print(f"   ✅ [{name}] Matched Serial: {target_id} -> {matched_dev}")
+            else:
+                matched_dev = by_loc.get(target_id)
+                if matched_dev:
                     print(f"   ✅ [{name}] Matched Location: {target_id} -> {matched_dev}")
-                    break
-            
+
+            if not matched_dev:
+                # 兜底: pyserial 的 grep 会在设备名/描述/硬件 ID 里做模糊匹配
+                try:
+                    hit = next(serial.tools.list_ports.grep(target_id), None)
+                except Exception:
+                    hit = None
+                if hit:
+                    matched_dev = hit.device
+                    print(f"   ✅ [{name}] Matched via grep: {target_id} -> {matched_dev}")
+
             if matched_dev:
                 found_ports[name] = matched_dev
             else:
                 print(f"   ❌ [{name}] Device '{target_id}' NOT found!")
                 found_ports[name] = None
                 all_success = False
-                
+
         return found_ports, all_success
 
 
@@ -70,6 +120,16 @@ class TeleopSystem:
         self.running = True
         self.side = side
         self.cfg = ARM_CONFIGS[side]
+
+        # 调试打印移出控制热循环: 热循环只往 deque 塞一个元组 (O(1)、GIL 原子)，
+        # 格式化和 stdout I/O 由后台线程做，终端卡顿不会阻塞 50Hz 节拍
+        self._log_q = collections.deque(maxlen=256)
+        threading.Thread(target=self._log_worker, daemon=True).start()
+
+        # 夹爪映射系数只算一次: map_gripper 每周期都跑，热路径里只剩乘加和比较
+        span = self.cfg['gripper_close'] - self.cfg['gripper_open']
+        self._grip_open = self.cfg['gripper_open']
+        self._grip_inv_span = 1.0 / span if abs(span) >= 0.1 else 0.0
         
         print(f"\n=== Initializing Single Arm Teleoperation ({side.upper()} ARM) ===")
         
@@ -108,20 +168,23 @@ class TeleopSystem:
             self.leader.driver.close()
             sys.exit(1)
 
+    def _log_worker(self):
+        """后台日志线程: 从环形队列取数据格式化打印"""
+        while self.running:
+            try:
+                gripper_raw, gripper_val, j1 = self._log_q.popleft()
+            except IndexError:
+                time.sleep(0.05)
+                continue
+            print(f"\r[{self.side.upper()} Gripper] Raw: {gripper_raw:5.1f}° -> Out: {gripper_val:4.2f} | J1: {j1:5.2f}", end="")
+
     def deg_to_rad(self, deg):
         return deg * (np.pi / 180.0)
 
     def map_gripper(self, raw_deg):
-        """连续线性映射"""
-        open_deg = self.cfg['gripper_open']
-        close_deg = self.cfg['gripper_close']
-        
-        span = close_deg - open_deg
-        if abs(span) < 0.1: return 0.0 
-        
-        ratio = (raw_deg - open_deg) / span
-        ratio = np.clip(ratio, 0.0, 1.0)
-        return ratio
+        """连续线性映射 (纯标量: 对单个 float 走 np.clip 的 ufunc 分发太贵)"""
+        ratio = (raw_deg - self._grip_open) * self._grip_inv_span
+        return 0.0 if ratio < 0.0 else 1.0 if ratio > 1.0 else ratio
 
     def run(self):
         print("\n==================================================")
@@ -136,9 +199,11 @@ class TeleopSystem:
         print(f"✅ {self.side.upper()} Leader Calibrated. GO!")
 
         try:
+            # 固定节拍调度 (纳秒格点): time.time() 受 NTP 校时影响且超时帧会累积漂移，
+            # 改用单调时钟 + 绝对截止时间；超时直接跳到下一个格点，不做"追帧"补发
+            PERIOD_NS = 20_000_000  # 50Hz
+            next_deadline = time.monotonic_ns() + PERIOD_NS
             while self.running:
-                loop_start = time.time()
-
                 # --- 1. 获取主手数据 ---
                 leader_angles = self.leader.get_angles()
                 if None in leader_angles.values(): continue
@@ -162,13 +227,21 @@ class TeleopSystem:
                 # --- 5. 发送指令 ---
                 self.follower.send_action(final_action)
 
-                # --- 6. 调试打印 ---
-                print(f"\r[{self.side.upper()} Gripper] Raw: {gripper_raw:5.1f}° -> Out: {gripper_val:4.2f} | J1: {final_action[0]:5.2f}", end="")
+                # --- 6. 调试数据入队，打印交给后台线程 ---
+                self._log_q.append((gripper_raw, gripper_val, final_action[0]))
 
                 # 50Hz Loop
-                elapsed = time.time() - loop_start
-                if elapsed < 0.02:
-                    time.sleep(0.02 - elapsed)
+                now = time.monotonic_ns()
+                slack = next_deadline - now
+                if slack > 0:
+                    time.sleep(slack / 1e9)
+                else:
+                    # 不足一个周期的超时不算丢格: 下一个格点还在前方，照常追上
+                    missed = (-slack) // PERIOD_NS
+                    if missed:
+                        print(f"\n[WARN] Loop overrun: skipping {missed} slot(s)")
+                        next_deadline += missed * PERIOD_NS
+                next_deadline += PERIOD_NS
 
         except KeyboardInterrupt:
             print("\nStopping...")
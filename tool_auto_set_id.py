@@ -7,6 +7,38 @@ PORT = '/dev/ttyACM0'  # Linux端口
 BAUDRATE = 1000000
 # =======================================
 
+def scan_servo_ids(sts):
+    """
+    扫描总线上在线的舵机 ID
+    阶段1 (快速): 按 32 个 ID 一组发 SYNC_READ 广播读 ID 寄存器 (Addr 5)，
+                  在线舵机会依次回包，一次排空解析 —— 254 次串口往返变 8 次广播
+    阶段2 (兜底): 广播完全没人响应时 (个别旧固件不支持 SYNC_READ)，
+                  退回 ping 扫描，但按 16 个一组流水线收发 + 3ms 超时加快
+    """
+    found = set()
+    for start in range(0, 254, 32):
+        chunk = list(range(start, min(start + 32, 254)))
+        print(".", end="", flush=True)
+        replies = sts.sync_read(STSServoDriver.SMS_STS_ID, 1, chunk)
+        found.update(replies.keys())
+    if found:
+        return sorted(found)
+
+    print("\n   Broadcast got no replies, falling back to pipelined ping scan...")
+    old_timeout = sts.timeout
+    sts.timeout = 0.003
+    if sts.ser:
+        sts.ser.timeout = 0.003
+    try:
+        for start in range(0, 254, 16):
+            print(".", end="", flush=True)
+            found.update(sts.ping_batch(range(start, min(start + 16, 254))))
+    finally:
+        sts.timeout = old_timeout
+        if sts.ser:
+            sts.ser.timeout = old_timeout
+    return sorted(found)
+
 def main():
     print("========================================================")
     print("        Feetech STS Servo Auto-ID Configurator          ")
@@ -20,21 +52,9 @@ def main():
 
     print("Step 1: Scanning for connected servo...")
     print("PLEASE WAIT (Scanning ID 0-253)...")
-    
-    found_ids = []
-    
-    # 快速扫描所有可能的ID
-    # 为了加快速度，我们可以暂时把超时设短一点，或者直接复用ping
-    # 250个ID扫描大概需要几秒钟
-    for scan_id in range(254):
-        # 每扫描10个ID打印一个点，作为进度条
-        if scan_id % 10 == 0:
-            print(".", end="", flush=True)
-            
-        if sts.ping(scan_id):
-            found_ids.append(scan_id)
-            # 如果只想找一个，找到就可以跳出，但为了安全建议扫完，防止连了两个
-            # break 
+
+    # 广播 SYNC_READ 批量探测，秒级扫完全部 ID (详见 scan_servo_ids)
+    found_ids = scan_servo_ids(sts)
 
     print("\n")
 
@@ -0,0 +1,51 @@
+import argparse
+import serial.tools.list_ports
+
+# 合并了 tool_list_usb_location.py 和 tool_list_usb_serial_ports.py:
+# 两个工具各自枚举一遍 comports()，这里一次枚举同时给出两种视图
+
+# 各模式展示的列 (列名 -> 取值函数)
+_COLUMNS = {
+    'device':       ('DEVICE',       15, lambda p: p.device),
+    'sn':           ('SN',           15, lambda p: p.serial_number or "None"),
+    'location':     ('LOCATION',     15, lambda p: p.location or "None"),
+    'vidpid':       ('VID:PID',      10, lambda p: (f"{p.vid:04X}:{p.pid:04X}"
+                                                    if p.vid is not None else "None")),
+    'manufacturer': ('MANUFACTURER', 20, lambda p: p.manufacturer or "Unknown"),
+    'description':  ('DESCRIPTION',  0,  lambda p: p.description or ""),
+}
+
+_MODES = {
+    'all':      ['device', 'sn', 'location', 'vidpid', 'manufacturer', 'description'],
+    'location': ['device', 'sn', 'location', 'description'],
+    'serial':   ['device', 'sn', 'manufacturer'],
+}
+
+def scan(mode='all'):
+    print("Scanning USB Serial Devices...\n")
+    # 只枚举一次 (一次扫描要遍历 /sys 逐个读属性)
+    ports = list(serial.tools.list_ports.comports())
+
+    if not ports:
+        print("❌ No serial devices found.")
+        return
+
+    cols = [_COLUMNS[c] for c in _MODES[mode]]
+    header = " ".join(f"{name:<{w}}" if w else name for name, w, _ in cols)
+    print(header)
+    print("-" * max(80, len(header)))
+
+    for p in ports:
+        print(" ".join(f"{get(p):<{w}}" if w else str(get(p))
+                       for _, w, get in cols))
+
+    print("-" * max(80, len(header)))
+    print("Tips: 'LOCATION' is the physical USB port ID — use it in your config")
+    print("      to distinguish devices with 'None' or identical serial numbers.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List USB serial ports")
+    parser.add_argument('--mode', choices=sorted(_MODES), default='all',
+                        help="Which columns to show (default: all)")
+    args = parser.parse_args()
+    scan(mode=args.mode)